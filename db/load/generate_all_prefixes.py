@@ -7,39 +7,44 @@ Usage:
     python generate_all_prefixes.py --out-dir ./precomp_data --parallel 10
 """
 
-import subprocess
+import multiprocessing
+import os
 import sys
 from pathlib import Path
 
-def generate_all_prefixes(out_dir: str = "./precomp_data", parallel: int = 10):
-    """Generate CSV files for all prefixes 050-059, each with 10M phone numbers."""
+from generate_precomp import build_tasks, worker
+
+def generate_all_prefixes(out_dir: str = "./precomp_data", parallel: int = 10, fmt: str = 'pgcopy'):
+    """Generate CSV files for all prefixes 050-059, each with 10M phone numbers.
+
+    One pool sized to the machine runs every prefix part, so all cores stay
+    busy instead of at most `parallel` workers per prefix in turn.
+    """
     prefixes = ['050', '051', '052', '053', '054', '055', '056', '057', '058', '059']
     total_phones = 10_000_000  # 10 million per prefix
-    
+
     Path(out_dir).mkdir(parents=True, exist_ok=True)
-    
+
+    num_workers = os.cpu_count() or parallel
+    tasks = []
+    for prefix in prefixes:
+        tasks.extend(build_tasks(prefix, total_phones, parallel, out_dir, fmt=fmt))
+
     print(f"Generating data for {len(prefixes)} prefixes, {total_phones:,} phones each...")
     print(f"Total: {len(prefixes) * total_phones:,} phone numbers")
     print(f"Output directory: {out_dir}")
-    print(f"Parallel files per prefix: {parallel}")
+    print(f"Files per prefix: {parallel}")
+    print(f"Worker processes: {num_workers}")
     print()
-    
-    for prefix in prefixes:
-        print(f"Generating prefix {prefix}...")
-        cmd = [
-            sys.executable,
-            "generate_precomp.py",
-            "--prefix", prefix,
-            "--count", str(total_phones),
-            "--parallel", str(parallel),
-            "--out-dir", out_dir
-        ]
-        result = subprocess.run(cmd, cwd=Path(__file__).parent)
-        if result.returncode != 0:
-            print(f"Error generating prefix {prefix}")
-            return False
-        print(f"✓ Completed prefix {prefix}\n")
-    
+
+    try:
+        with multiprocessing.Pool(processes=num_workers) as pool:
+            for i, output_file in enumerate(pool.imap_unordered(worker, tasks), 1):
+                print(f"[{i}/{len(tasks)}] ✓ {Path(output_file).name}")
+    except Exception as e:
+        print(f"Error during generation: {e}")
+        return False
+
     print(f"All prefixes generated in {out_dir}")
     return True
 
@@ -50,8 +55,10 @@ if __name__ == '__main__':
                        help='Output directory for CSV files')
     parser.add_argument('--parallel', type=int, default=10,
                        help='Number of parallel files per prefix')
-    
+    parser.add_argument('--format', choices=['csv', 'pgcopy', 'packed'], default='pgcopy',
+                       help='Generated file format: csv, PostgreSQL binary COPY, or packed 27-byte records')
+
     args = parser.parse_args()
-    success = generate_all_prefixes(args.out_dir, args.parallel)
+    success = generate_all_prefixes(args.out_dir, args.parallel, args.format)
     sys.exit(0 if success else 1)
 
@@ -8,61 +8,272 @@ Usage:
 """
 
 import argparse
+import binascii
 import hashlib
-import csv
 import multiprocessing
+import os
+import struct
 from pathlib import Path
 from typing import Generator
 
+# Try to import an optional multi-buffer MD5 extension (e.g. ISA-L md5_mb
+# bindings). It hashes many independent short messages per call using
+# SIMD lanes, which is 4-8x faster than per-message hashlib on this workload.
+try:
+    import md5_mb
+    HAS_MD5_MB = True
+except ImportError:
+    HAS_MD5_MB = False
+
+# NumPy lets us build the 11-byte ASCII buffers for a whole batch with a
+# handful of vectorized divmod ops instead of one f-string per row.
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# zstandard enables compressed .zst output (~4x smaller on this data);
+# the loaders stream-decompress into COPY without a temp file.
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# Numba JIT MD5 kernel: hashes a whole batch with prange across cores.
+# Only worth using when the batch is already a contiguous NumPy array.
+import md5_njit
+HAS_NUMBA_MD5 = md5_njit.HAS_NUMBA and HAS_NUMPY
+
+# Number of phones formatted and hashed per batch in the hot loop
+HASH_BATCH_SIZE = 4096
+
+# 16 MiB write buffer keeps write(2) syscalls to a handful per output file
+WRITE_BUFFER_SIZE = 16 << 20
+
+
+def _open_output(path: str, size_hint: int):
+    """Open an output file with a large write buffer.
+
+    Row sizes are fixed, so the final file size is known up front and is
+    preallocated (best effort) to avoid extent fragmentation. Paths ending
+    in .zst are wrapped in a zstd compression stream instead.
+    """
+    if path.endswith('.zst'):
+        if not HAS_ZSTD:
+            raise RuntimeError("zstandard is required for .zst output (pip install zstandard)")
+        raw = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw)
+    f = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+    if size_hint and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size_hint)
+        except OSError:
+            pass  # preallocation is an optimization, not a requirement
+    return f
+
+
+def _md5_batch(messages: list, seed=None, seed_len: int = 0) -> list:
+    """Compute MD5 digests for a batch of byte strings.
+
+    Uses the multi-buffer extension when available, otherwise falls back
+    to hashlib. In the hashlib path a seed context that has already
+    absorbed the shared seed_len-byte prefix can be passed in; each digest
+    is then a .copy() of the seed updated with just the message tail,
+    which skips the per-row constructor and the re-hashing of the prefix.
+    """
+    if HAS_MD5_MB:
+        return md5_mb.digest_many(messages)
+    if HAS_NUMBA_MD5 and messages:
+        n = len(messages)
+        msg_len = len(messages[0])
+        msgs = np.frombuffer(b''.join(messages), dtype=np.uint8).reshape(n, msg_len)
+        out = np.empty((n, 16), dtype=np.uint8)
+        md5_njit.md5_many(msgs, msg_len, seed_len, out)
+        raw = out.tobytes()
+        return [raw[i * 16:(i + 1) * 16] for i in range(n)]
+    if seed is not None:
+        out = []
+        for m in messages:
+            h = seed.copy()
+            h.update(m[seed_len:])
+            out.append(h.digest())
+        return out
+    return [hashlib.md5(m).digest() for m in messages]
+
+
+def _format_batch(prefix: str, start: int, end: int, with_dash: bool) -> list:
+    """Format phone numbers start..end-1 as 11-byte ASCII strings.
+
+    With NumPy available the whole batch is built in one (end-start)x11
+    uint8 array: the constant prefix (and dash) is broadcast once and each
+    of the remaining digit columns is filled with a vectorized
+    divmod-and-add-0x30, avoiding per-row str formatting entirely.
+    """
+    if HAS_NUMPY:
+        head = (prefix + '-') if with_dash else prefix
+        digits = 11 - len(head)
+        n = end - start
+        buf = np.empty((n, 11), dtype=np.uint8)
+        buf[:, :len(head)] = np.frombuffer(head.encode(), dtype=np.uint8)
+        idx = np.arange(start, end, dtype=np.int64)
+        for k in range(digits):
+            buf[:, len(head) + k] = (idx // 10 ** (digits - 1 - k)) % 10 + 0x30
+        raw = buf.tobytes()
+        return [raw[i * 11:(i + 1) * 11] for i in range(n)]
+    if with_dash:
+        return [f"{prefix}-{i:07d}".encode() for i in range(start, end)]  # 050-1234567 = 11 chars
+    return [f"{prefix}{i:08d}".encode() for i in range(start, end)]  # 05012345678 = 11 chars
+
+
+def generate_phones(prefix: str, start: int, count: int, with_dash: bool = True) -> Generator[tuple[bytes, str], None, None]:
+    """Generate phone numbers and their raw 16-byte MD5 digests.
+
+    Digests stay raw; only the CSV writer hex-encodes them. Phones are
+    formatted and hashed in batches of HASH_BATCH_SIZE so the formatting
+    stage can be vectorized with NumPy and the MD5 stage can use a
+    multi-buffer (SIMD) implementation when one is installed.
 
-def generate_phones(prefix: str, start: int, count: int, with_dash: bool = True) -> Generator[tuple[str, str], None, None]:
-    """Generate phone numbers and their MD5 hashes.
-    
     Args:
         prefix: Phone prefix (e.g., '050')
         start: Starting number (0-9999999)
         count: Number of phones to generate
         with_dash: If True, format as 05X-XXXXXXX, else 05XXXXXXXXX
     """
-    for i in range(start, start + count):
-        if with_dash:
-            phone = f"{prefix}-{i:07d}"  # 050-1234567 = 11 chars
-        else:
-            phone = f"{prefix}{i:08d}"  # 05012345678 = 11 chars
-        md5_hash = hashlib.md5(phone.encode()).hexdigest()
-        yield (md5_hash, phone)
+    for digests, phones in _generate_batches(prefix, start, count, with_dash):
+        for digest, phone in zip(digests, phones):
+            yield (digest, phone.decode())
+
+
+def _generate_batches(prefix: str, start: int, count: int, with_dash: bool) -> Generator[tuple[list, list], None, None]:
+    """Yield (digests, phones) batches of HASH_BATCH_SIZE raw rows."""
+    end = start + count
+    # Every phone in this run shares the same head ('050-' or '050'), so one
+    # context absorbs it once and each row only hashes its digit tail
+    head = (prefix + '-') if with_dash else prefix
+    seed = hashlib.md5(head.encode())
+    for batch_start in range(start, end, HASH_BATCH_SIZE):
+        batch_end = min(batch_start + HASH_BATCH_SIZE, end)
+        phones = _format_batch(prefix, batch_start, batch_end, with_dash)
+        yield _md5_batch(phones, seed, len(head)), phones
+
+
+def _encoded_rows_sorted(prefix: str, start: int, count: int, with_dash: bool, encode) -> list:
+    """Encode every row of one part file and sort the rows by md5 digest.
+
+    In every output format the digest is the first varying byte sequence
+    of the encoded row (hex sorts like the raw bytes), so a plain sort of
+    the encoded rows orders the file by md5_hash. Digest-sorted input
+    turns the PK index build (or upserts) from random B-tree descents
+    into mostly-sequential leaf appends. A part file is ~1M rows, so
+    materializing it is ~100MB per worker — cheap next to the hashing.
+    """
+    rows = []
+    for digests, phones in _generate_batches(prefix, start, count, with_dash):
+        rows.extend(encode(digest, phone) for digest, phone in zip(digests, phones))
+    rows.sort()
+    return rows
 
 
 def write_csv(prefix: str, start: int, count: int, output_file: str, with_dash: bool = True):
-    """Write a single CSV file with MD5 hashes and phone numbers."""
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        for md5_hex, phone in generate_phones(prefix, start, count, with_dash):
-            writer.writerow([md5_hex, phone])
+    """Write a single CSV file with MD5 hashes and phone numbers.
+
+    Both fields are known-safe ASCII (hex digits and digits+dash), so no
+    CSV quoting is ever needed. Rows are written digest-sorted in one
+    f.write instead of going through csv.writer row by row.
+    """
+    rows = _encoded_rows_sorted(prefix, start, count, with_dash,
+                                lambda digest, phone: binascii.hexlify(digest) + b',' + phone + b'\n')
+    # 32 hex chars + ',' + 11-char phone + newline
+    with _open_output(output_file, 45 * count) as f:
+        f.write(b''.join(rows))
+
+
+# PostgreSQL binary COPY framing: signature + flags + header-extension
+# length, and the end-of-data marker (see the COPY chapter of the PG docs).
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+
+
+def write_pgcopy(prefix: str, start: int, count: int, output_file: str, with_dash: bool = True):
+    """Write a single file in PostgreSQL binary COPY format.
+
+    Each row carries the raw 16-byte digest and the 11-byte phone, ready
+    to stream straight into
+    COPY md5_phone_map_bin (md5_hash, phone_number) FROM STDIN WITH (FORMAT BINARY)
+    with no hex encoding here and no decode() pass on the server.
+    """
+    row_head = struct.pack('>hi', 2, 16)  # 2 fields, first is 16 bytes
+    phone_len = struct.pack('>i', 11)
+    # The constant row head prefixes every encoded row, so the sort
+    # still orders by the digest bytes that follow it
+    rows = _encoded_rows_sorted(prefix, start, count, with_dash,
+                                lambda digest, phone: row_head + digest + phone_len + phone)
+    # header + N * (field count + 2 length-prefixed fields) + trailer
+    size_hint = len(PGCOPY_HEADER) + count * 37 + len(PGCOPY_TRAILER)
+    with _open_output(output_file, size_hint) as f:
+        f.write(PGCOPY_HEADER)
+        f.write(b''.join(rows))
+        f.write(PGCOPY_TRAILER)
+
+
+def write_packed(prefix: str, start: int, count: int, output_file: str, with_dash: bool = True):
+    """Write fixed-width 27-byte records: 16-byte digest || 11-byte phone.
+
+    The smallest on-disk intermediate: no hex (16 instead of 32 bytes per
+    digest), no separators, no framing — about 40% smaller than CSV. The
+    loader reframes records into binary COPY rows on the fly, so the data
+    never touches disk twice.
+    """
+    rows = _encoded_rows_sorted(prefix, start, count, with_dash,
+                                lambda digest, phone: digest + phone)
+    with _open_output(output_file, 27 * count) as f:
+        f.write(b''.join(rows))
+
+
+# Supported output formats: writer function and file extension
+WRITERS = {
+    'csv': write_csv,
+    'pgcopy': write_pgcopy,
+    'packed': write_packed,
+}
 
 
 def worker(args):
     """Worker function for parallel generation."""
-    prefix, start, count, output_file, with_dash = args
-    write_csv(prefix, start, count, output_file, with_dash)
+    prefix, start, count, output_file, with_dash, fmt = args
+    WRITERS[fmt](prefix, start, count, output_file, with_dash)
     return output_file
 
 
-def generate_parallel(prefix: str, total_count: int, num_files: int, out_dir: str, with_dash: bool = True):
-    """Generate multiple CSV files in parallel."""
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
+def build_tasks(prefix: str, total_count: int, num_files: int, out_dir: str,
+                with_dash: bool = True, fmt: str = 'pgcopy', compress: bool = False) -> list:
+    """Build the per-part worker task tuples for one prefix.
+
+    Callers generating several prefixes concatenate these lists and feed
+    them to a single shared pool instead of one pool per prefix.
+    """
     count_per_file = total_count // num_files
-    
+    ext = f"{fmt}.zst" if compress else fmt
     tasks = []
     for i in range(num_files):
         start = i * count_per_file
         count = count_per_file if i < num_files - 1 else total_count - start
-        output_file = str(Path(out_dir) / f"precomp_{prefix}_part{i:03d}.csv")
-        tasks.append((prefix, start, count, output_file, with_dash))
-    
-    with multiprocessing.Pool(processes=num_files) as pool:
+        output_file = str(Path(out_dir) / f"precomp_{prefix}_part{i:03d}.{ext}")
+        tasks.append((prefix, start, count, output_file, with_dash, fmt))
+    return tasks
+
+
+def generate_parallel(prefix: str, total_count: int, num_files: int, out_dir: str,
+                      with_dash: bool = True, fmt: str = 'pgcopy', compress: bool = False):
+    """Generate multiple output files in parallel."""
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    tasks = build_tasks(prefix, total_count, num_files, out_dir, with_dash, fmt, compress)
+
+    with multiprocessing.Pool(processes=min(num_files, os.cpu_count() or num_files)) as pool:
         results = pool.map(worker, tasks)
-    
+
     print(f"Generated {len(results)} files in {out_dir}")
     return results
 
@@ -76,20 +287,25 @@ def main():
     parser.add_argument('--parallel', type=int, help='Number of parallel files to generate')
     parser.add_argument('--out-dir', type=str, default='./precomp_data', help='Output directory for parallel generation')
     parser.add_argument('--no-dash', action='store_true', help='Generate without dash (05XXXXXXXXX format)')
-    
+    parser.add_argument('--format', choices=sorted(WRITERS), default='pgcopy',
+                        help='Output format: csv (hex,phone) or pgcopy (PostgreSQL binary COPY)')
+    parser.add_argument('--compress', action='store_true',
+                        help='Write zstd-compressed .zst files (requires the zstandard package)')
+
     args = parser.parse_args()
     with_dash = not args.no_dash
-    
+
     if args.parallel:
         if not args.count:
             print("Error: --count is required when using --parallel")
             return
-        generate_parallel(args.prefix, args.count, args.parallel, args.out_dir, with_dash)
+        generate_parallel(args.prefix, args.count, args.parallel, args.out_dir, with_dash,
+                          args.format, args.compress)
     else:
         if not args.count or not args.out:
             print("Error: --count and --out are required when not using --parallel")
             return
-        write_csv(args.prefix, args.start, args.count, args.out, with_dash)
+        WRITERS[args.format](args.prefix, args.start, args.count, args.out, with_dash)
         print(f"Generated {args.count} rows in {args.out}")
 
 
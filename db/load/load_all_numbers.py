@@ -12,130 +12,163 @@ Usage:
     python load_all_numbers.py [--out-dir ./precomp_data] [--parallel 10] [--skip-generation]
 """
 
+import binascii
+import io
+import struct
 import sys
-import subprocess
+import threading
 import time
 import os
 from pathlib import Path
 import glob
+import re
 import argparse
 import json
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Set
 
-# Try to import psycopg2 for direct DB connection (when running in Docker)
+import generate_precomp
+
+# psycopg2 is required: every database operation here goes over a direct
+# libpq connection (COPY via copy_expert, maintenance SQL, statistics)
 try:
     import psycopg2
-    from psycopg2.extras import execute_values
     from psycopg2 import extensions
     HAS_PSYCOPG2 = True
 except ImportError:
     HAS_PSYCOPG2 = False
     extensions = None
 
-def check_docker_container(container_name: str) -> bool:
-    """Check if Docker container is running."""
-    # Skip check if running inside Docker (docker command won't be available)
-    if os.getenv('POSTGRES_HOST'):
-        return True  # Assume container is running if we're in Docker
-    try:
-        result = subprocess.run(
-            ["docker", "ps", "--filter", f"name={container_name}", "--format", "{{.Names}}"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return container_name in result.stdout
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+# Optional zstd support for compressed .zst data files
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
 
-def check_table_empty(container: str, db_name: str, db_user: str,
-                     db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
-    """Check if md5_phone_map_bin table is empty."""
-    # If running in Docker, use direct connection
-    if HAS_PSYCOPG2 and db_host and db_password:
-        try:
-            conn = psycopg2.connect(
-                host=db_host,
-                port=db_port or 5432,
-                database=db_name,
-                user=db_user,
-                password=db_password
-            )
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM md5_phone_map_bin;")
-            count = cur.fetchone()[0]
-            cur.close()
-            conn.close()
-            return count == 0
-        except Exception:
-            return False
-    
-    # Otherwise use docker exec (only if not in Docker)
-    if db_host:
-        # We're in Docker but psycopg2 failed, return False to be safe
-        return False
+# 1 MiB read buffer: line iteration and record reframing see few big reads
+READ_BUFFER_SIZE = 1 << 20
+
+def _open_data_file(path: str):
+    """Open a data file for COPY, stream-decompressing .zst on the fly."""
+    f = open(path, 'rb', buffering=READ_BUFFER_SIZE)
+    if path.endswith('.zst'):
+        if not HAS_ZSTD:
+            f.close()
+            raise RuntimeError("zstandard is required to load .zst files (pip install zstandard)")
+        # BufferedReader gives the decompression stream a readline() for the
+        # CSV adapter and large read chunks for copy_expert
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f), READ_BUFFER_SIZE)
+    return f
+
+def connect_db(db_name: str, db_user: str, db_host: str, db_port: int, db_password: str):
+    """Open a psycopg2 connection with the shared connection parameters."""
+    return psycopg2.connect(
+        host=db_host,
+        port=db_port or 5432,
+        database=db_name,
+        user=db_user,
+        password=db_password
+    )
+
+def check_table_empty(db_name: str, db_user: str,
+                      db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
+    """Check if md5_phone_map_bin table is empty.
+
+    EXISTS short-circuits on the first heap tuple, unlike COUNT(*)
+    which seq-scans all 100M rows just to answer empty-or-not.
+    """
     try:
-        result = subprocess.run([
-            "docker", "exec", container,
-            "psql", "-U", db_user, "-d", db_name, "-t",
-            "-c", "SELECT COUNT(*) FROM md5_phone_map_bin;"
-        ], capture_output=True, text=True, check=True)
-        count = int(result.stdout.strip())
-        return count == 0
-    except (subprocess.CalledProcessError, ValueError, FileNotFoundError):
+        conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+        cur = conn.cursor()
+        cur.execute("SELECT NOT EXISTS (SELECT 1 FROM md5_phone_map_bin);")
+        is_empty = cur.fetchone()[0]
+        cur.close()
+        conn.close()
+        return is_empty
+    except Exception:
         return False
 
-def clear_table(container: str, db_name: str, db_user: str,
+def clear_table(db_name: str, db_user: str,
                 db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
     """Clear the md5_phone_map_bin table."""
-    # If running in Docker, use direct connection
-    if HAS_PSYCOPG2 and db_host and db_password:
-        try:
-            print("Clearing md5_phone_map_bin table...")
-            conn = psycopg2.connect(
-                host=db_host,
-                port=db_port or 5432,
-                database=db_name,
-                user=db_user,
-                password=db_password
-            )
-            cur = conn.cursor()
-            cur.execute("TRUNCATE TABLE md5_phone_map_bin CASCADE;")
-            conn.commit()
-            cur.close()
-            conn.close()
-            print("✓ Table cleared")
-            return True
-        except Exception as e:
-            print(f"❌ Failed to clear table: {e}")
-            return False
-    
-    # Otherwise use docker exec (only if not in Docker)
-    if db_host:
-        print("❌ Cannot clear table: psycopg2 connection failed")
-        return False
     try:
         print("Clearing md5_phone_map_bin table...")
-        subprocess.run([
-            "docker", "exec", container,
-            "psql", "-U", db_user, "-d", db_name,
-            "-c", "TRUNCATE TABLE md5_phone_map_bin CASCADE;"
-        ], check=True, capture_output=True)
+        conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+        cur = conn.cursor()
+        cur.execute("TRUNCATE TABLE md5_phone_map_bin CASCADE;")
+        conn.commit()
+        cur.close()
+        conn.close()
         print("✓ Table cleared")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("❌ Failed to clear table")
+    except Exception as e:
+        print(f"❌ Failed to clear table: {e}")
+        return False
+
+def drop_indexes(db_name: str, db_user: str,
+                 db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
+    """Drop the primary key and secondary index before a bulk load.
+
+    Loading into an unindexed heap is append-only; the indexes are rebuilt
+    once at the end with a sort-based build instead of 100M incremental
+    B-tree insertions.
+    """
+    sql = """
+        ALTER TABLE md5_phone_map_bin DROP CONSTRAINT IF EXISTS md5_phone_map_bin_pkey;
+        DROP INDEX IF EXISTS idx_md5_phone_map_phone;
+    """
+    return _run_maintenance_sql("Dropping indexes on md5_phone_map_bin...", sql,
+                                db_name, db_user, db_host, db_port, db_password)
+
+def recreate_indexes(db_name: str, db_user: str,
+                     db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
+    """Rebuild the primary key and secondary index after a bulk load."""
+    sql = """
+        SET maintenance_work_mem = '4GB';
+        SET max_parallel_maintenance_workers = 8;
+        ALTER TABLE md5_phone_map_bin ADD PRIMARY KEY (md5_hash);
+        CREATE INDEX IF NOT EXISTS idx_md5_phone_map_phone ON md5_phone_map_bin(phone_number);
+    """
+    return _run_maintenance_sql("Rebuilding indexes on md5_phone_map_bin (may take a while)...", sql,
+                                db_name, db_user, db_host, db_port, db_password)
+
+def _run_maintenance_sql(message: str, sql: str, db_name: str, db_user: str,
+                         db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
+    """Run a maintenance SQL block over a direct connection."""
+    print(message)
+    try:
+        conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+        cur = conn.cursor()
+        cur.execute(sql)
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("✓ Done")
+        return True
+    except Exception as e:
+        print(f"❌ Failed: {e}")
         return False
 
-def generate_all_prefixes(out_dir: str, parallel: int):
-    """Generate CSV files for all prefixes 050-059."""
+def generate_all_prefixes(out_dir: str, parallel: int, fmt: str = 'pgcopy', compress: bool = False):
+    """Generate CSV files for all prefixes 050-059.
+
+    All prefix parts go into one shared pool sized to the machine, so every
+    core stays busy for the whole run instead of at most `parallel` workers
+    per prefix with a pool teardown between prefixes.
+    """
     prefixes = ['050', '051', '052', '053', '054', '055', '056', '057', '058', '059']
     total_phones = 10_000_000  # 10 million per prefix
-    
+
     Path(out_dir).mkdir(parents=True, exist_ok=True)
-    
+
+    num_workers = os.cpu_count() or parallel
+    tasks = []
+    for prefix in prefixes:
+        tasks.extend(generate_precomp.build_tasks(prefix, total_phones, parallel, out_dir,
+                                                  fmt=fmt, compress=compress))
+
     print("=" * 70)
     print("PHONE NUMBER GENERATION")
     print("=" * 70)
@@ -143,134 +176,374 @@ def generate_all_prefixes(out_dir: str, parallel: int):
     print(f"Phones per prefix: {total_phones:,}")
     print(f"Total phone numbers: {len(prefixes) * total_phones:,}")
     print(f"Output directory: {out_dir}")
-    print(f"Parallel files per prefix: {parallel}")
+    print(f"Files per prefix: {parallel}")
+    print(f"Worker processes: {num_workers}")
     print()
-    
+
     start_time = time.time()
-    
-    for i, prefix in enumerate(prefixes, 1):
-        print(f"[{i}/{len(prefixes)}] Generating prefix {prefix}...")
-        prefix_start = time.time()
-        
-        cmd = [
-            sys.executable,
-            str(Path(__file__).parent / "generate_precomp.py"),
-            "--prefix", prefix,
-            "--count", str(total_phones),
-            "--parallel", str(parallel),
-            "--out-dir", out_dir
-        ]
-        
-        result = subprocess.run(cmd, cwd=Path(__file__).parent)
-        if result.returncode != 0:
-            print(f"❌ Error generating prefix {prefix}")
-            return False
-        
-        prefix_time = time.time() - prefix_start
-        print(f"✓ Completed prefix {prefix} in {prefix_time/60:.1f} minutes\n")
-    
+
+    try:
+        with multiprocessing.Pool(processes=num_workers) as pool:
+            for i, output_file in enumerate(pool.imap_unordered(generate_precomp.worker, tasks), 1):
+                print(f"[{i}/{len(tasks)}] ✓ {Path(output_file).name}")
+    except Exception as e:
+        print(f"❌ Error during generation: {e}")
+        return False
+
     total_time = time.time() - start_time
     print(f"✓ All prefixes generated in {total_time/60:.1f} minutes")
     
     # Count generated files
-    csv_files = glob.glob(str(Path(out_dir) / "precomp_*.csv"))
-    print(f"✓ Generated {len(csv_files)} CSV files")
+    csv_files = (glob.glob(str(Path(out_dir) / "precomp_*.csv")) +
+                 glob.glob(str(Path(out_dir) / "precomp_*.pgcopy")) +
+                 glob.glob(str(Path(out_dir) / "precomp_*.packed")) +
+                 glob.glob(str(Path(out_dir) / "precomp_*.zst")))
+    print(f"✓ Generated {len(csv_files)} files")
     print()
     return True
 
-def load_csv_file_direct(csv_file: str, db_host: str, db_port: int, db_name: str, db_user: str, db_password: str) -> bool:
-    """Load CSV file directly using psycopg2 (when running in Docker)."""
-    import csv
-    
+def generate_and_load_pipelined(out_dir: str, parallel: int, fmt: str, compress: bool,
+                                db_name: str, db_user: str, db_host: str, db_port: int,
+                                db_password: str, max_workers: int = None,
+                                delete_after_load: bool = False) -> bool:
+    """Generate and load in one overlapped pipeline.
+
+    Generator workers produce files in a shared pool while loader workers
+    COPY finished files into PostgreSQL, so wall time approaches
+    max(T_gen, T_load) instead of T_gen + T_load. With delete_after_load
+    each file is removed once committed, capping disk usage at the few
+    files in flight instead of the full data set.
+    """
+    prefixes = ['050', '051', '052', '053', '054', '055', '056', '057', '058', '059']
+    total_phones = 10_000_000  # 10 million per prefix
+
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    gen_workers = os.cpu_count() or parallel
+    tasks = []
+    for prefix in prefixes:
+        tasks.extend(generate_precomp.build_tasks(prefix, total_phones, parallel, out_dir,
+                                                  fmt=fmt, compress=compress))
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 4)
+
+    state = load_state(out_dir)
+    loaded_files_set = state["loaded_files"]
+
+    print("=" * 70)
+    print("PIPELINED GENERATION + LOADING")
+    print("=" * 70)
+    print(f"Prefixes: {', '.join(prefixes)}")
+    print(f"Total phone numbers: {len(prefixes) * total_phones:,}")
+    print(f"Generation workers: {gen_workers} | Loader workers: {max_workers}")
+    print(f"Connecting to: {db_host}:{db_port or 5432}/{db_name}")
+    print(f"Already loaded: {len(loaded_files_set)} files")
+    print()
+
+    start_time = time.time()
+    newly_loaded = 0
+    newly_failed = 0
+    handled = 0
+
+    def handle_result(future, data_file):
+        """Record one finished load: state bookkeeping and optional cleanup."""
+        nonlocal newly_loaded, newly_failed, handled
+        file_name = Path(data_file).name
+        handled += 1
+        try:
+            success = future.result()
+        except Exception as e:
+            print(f"❌ {file_name} (Exception: {e})")
+            success = False
+        record_file_state(out_dir, file_name, success)
+        if success:
+            newly_loaded += 1
+            elapsed = time.time() - start_time
+            print(f"[{handled}/{len(tasks)}] ✓ {file_name} loaded | "
+                  f"Loaded: {newly_loaded} | Failed: {newly_failed} | "
+                  f"Elapsed: {elapsed/60:.1f}m")
+            if delete_after_load:
+                try:
+                    os.remove(data_file)
+                except OSError:
+                    pass
+        else:
+            newly_failed += 1
+            print(f"[{handled}/{len(tasks)}] ❌ {file_name} failed to load")
+
+    with multiprocessing.Pool(processes=gen_workers) as gen_pool, \
+            ThreadPoolExecutor(max_workers=max_workers,
+                               initializer=_init_load_worker,
+                               initargs=(db_name, db_user, db_host, db_port, db_password)) as load_pool:
+        pending = {}
+        for output_file in gen_pool.imap_unordered(generate_precomp.worker, tasks):
+            file_name = Path(output_file).name
+            if file_name in loaded_files_set:
+                handled += 1
+                print(f"[{handled}/{len(tasks)}] ✓ {file_name} already loaded, skipping")
+                continue
+            pending[load_pool.submit(
+                load_csv_file_worker,
+                (output_file, db_name, db_user, db_host, db_port, db_password)
+            )] = output_file
+            # Reap finished loads as we go so state (and disk, when files
+            # are deleted after load) tracks the pipeline, not the end
+            for future in [f for f in pending if f.done()]:
+                handle_result(future, pending.pop(future))
+
+        for future in as_completed(list(pending)):
+            handle_result(future, pending.pop(future))
+
+    total_time = time.time() - start_time
+    print()
+    print(f"✓ Pipeline finished in {total_time/60:.1f} minutes "
+          f"({newly_loaded} loaded, {newly_failed} failed)")
+
+    if newly_failed == 0:
+        _run_maintenance_sql("Running ANALYZE on md5_phone_map_bin...",
+                             "ANALYZE md5_phone_map_bin;",
+                             db_name, db_user, db_host, db_port, db_password)
+    return newly_failed == 0
+
+# Per-row binary COPY framing shared by the row generators below
+_ROW_HEAD = struct.pack('>hi', 2, 16)  # 2 fields, first is 16 bytes
+_PHONE_LEN = struct.pack('>i', 11)
+_PACKED_RECORD = 27
+
+def _csv_copy_rows(f):
+    """Yield binary COPY row chunks for a 'hex,phone' CSV stream.
+
+    The hex digest is decoded client-side with unhexlify, so the server
+    receives ready-made 16-byte values: half the bytes on the wire of
+    the hex form, and no text-format parsing or bytea unescaping per row.
+    """
+    pack_len = struct.pack
+    unhex = binascii.unhexlify
+    rows = []
+    for line in f:
+        # \r\n handles CRLF endings from the legacy csv.writer files
+        md5_hex, phone = line.rstrip(b'\r\n').split(b',', 1)
+        rows.append(_ROW_HEAD + unhex(md5_hex) + pack_len('>i', len(phone)) + phone)
+        if len(rows) >= 4096:
+            yield b''.join(rows)
+            rows = []
+    if rows:
+        yield b''.join(rows)
+
+def _packed_copy_rows(f):
+    """Yield binary COPY row chunks for a packed 27-byte-record stream."""
+    tail = b''
+    while True:
+        # Break on EOF of the file, not on the buffered data: a leftover
+        # partial record in tail must not keep the loop alive
+        chunk = f.read(_PACKED_RECORD * 4096)
+        if not chunk:
+            break
+        data = tail + chunk
+        # Carry any partial record over to the next read
+        cut = len(data) - len(data) % _PACKED_RECORD
+        data, tail = data[:cut], data[cut:]
+        if data:
+            yield b''.join(
+                _ROW_HEAD + data[i:i + 16] + _PHONE_LEN + data[i + 16:i + _PACKED_RECORD]
+                for i in range(0, len(data), _PACKED_RECORD)
+            )
+    if tail:
+        raise ValueError(f"truncated packed record ({len(tail)} trailing bytes)")
+
+def _pgcopy_file_rows(f):
+    """Yield the row bytes of an on-disk pgcopy stream, minus its framing.
+
+    The per-file PGCOPY header and end-of-data marker are stripped so the
+    rows can be spliced into a larger COPY stream.
+    """
+    head = f.read(len(generate_precomp.PGCOPY_HEADER))
+    if head != generate_precomp.PGCOPY_HEADER:
+        raise ValueError("not a PGCOPY binary file")
+    # Hold the last two bytes back; at EOF they must be the trailer
+    carry = b''
+    while True:
+        chunk = f.read(READ_BUFFER_SIZE)
+        if not chunk:
+            break
+        data = carry + chunk
+        carry = data[-2:]
+        yield data[:-2]
+    if carry != generate_precomp.PGCOPY_TRAILER:
+        raise ValueError("pgcopy file missing end-of-data marker")
+
+def _copy_rows_for_file(data_file, f):
+    """Pick the row generator matching a data file's format."""
+    data_name = data_file[:-4] if data_file.endswith('.zst') else data_file
+    if data_name.endswith('.pgcopy'):
+        return _pgcopy_file_rows(f)
+    if data_name.endswith('.packed'):
+        return _packed_copy_rows(f)
+    return _csv_copy_rows(f)
+
+class PgcopyChain:
+    """File-like adapter streaming one or more data files as one binary COPY.
+
+    A single PGCOPY header and trailer frame the concatenated rows of
+    every file, whatever mix of formats they use — so a whole prefix
+    group loads as one COPY statement with one start/end handshake,
+    instead of one COPY per file. read() buffers the frame stream into
+    the sizes copy_expert asks for.
+    """
+
+    def __init__(self, files):
+        self._chunks = self._frames(files)
+        self._buf = b''
+
+    def _frames(self, files):
+        yield generate_precomp.PGCOPY_HEADER
+        for data_file in files:
+            with _open_data_file(data_file) as f:
+                yield from _copy_rows_for_file(data_file, f)
+        yield generate_precomp.PGCOPY_TRAILER
+
+    def read(self, size=8192):
+        while size <= 0 or len(self._buf) < size:
+            try:
+                self._buf += next(self._chunks)
+            except StopIteration:
+                break
+        if size <= 0:
+            out, self._buf = self._buf, b''
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+def _tune_load_session(conn):
+    """Apply per-connection bulk-load settings on a fresh connection.
+
+    These are session-local and die with the connection; psycopg2 wraps
+    everything until commit() in one transaction, so there is a single
+    commit (and at most one WAL flush) per transaction regardless of how
+    many files stream through it.
+    """
+    conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_READ_COMMITTED)
+    cur = conn.cursor()
+    cur.execute("SET lock_timeout = '5s'")
+    cur.execute("SET synchronous_commit = off")
+    cur.execute("SET maintenance_work_mem = '1GB'")
+    cur.execute("SET work_mem = '256MB'")
+    cur.execute("SET client_min_messages = warning")
+    return cur
+
+def _copy_data_files(cur, data_files: List[str]) -> int:
+    """COPY csv/pgcopy/packed (optionally .zst) files into md5_phone_map_bin.
+
+    Everything goes over one binary COPY statement: pgcopy rows stream in
+    as-is, packed and CSV files are reframed on the fly (CSV digests
+    hex-decoded client-side). There is no staging table and no server-side
+    text parsing or decode() pass. Returns the number of rows copied.
+    """
+    # size= bumps copy_expert's read chunk from the default 8KB to 1MB:
+    # far fewer Python-level read() calls and socket writes per file
+    cur.copy_expert(
+        "COPY md5_phone_map_bin (md5_hash, phone_number) FROM STDIN WITH (FORMAT BINARY)",
+        PgcopyChain(data_files),
+        size=READ_BUFFER_SIZE
+    )
+    return cur.rowcount
+
+# One connection per worker thread, opened by the pool initializer and
+# reused for every file/group task the thread handles. psycopg2 releases
+# the GIL inside libpq, so threads give full COPY parallelism without
+# fork cost, and thread-local storage keeps connections unshared.
+_WORKER = threading.local()
+
+def _init_load_worker(db_name, db_user, db_host, db_port, db_password):
+    """Pool initializer: open this worker thread's persistent connection.
+
+    Amortizes the TCP handshake, authentication and session SETs over
+    all the tasks a thread runs instead of paying them once per file.
+    Failure is non-fatal — the thread falls back to per-task connections.
+    """
+    try:
+        _WORKER.conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+        _tune_load_session(_WORKER.conn).close()
+    except Exception as e:
+        print(f"⚠️  Worker could not pre-open a connection ({e}); will connect per task")
+        _WORKER.conn = None
+
+def _worker_cursor(db_name, db_user, db_host, db_port, db_password):
+    """Get (conn, cur, owned) for a load task.
+
+    Prefers the thread's persistent connection (owned=False); opens and
+    tunes a fresh one, which the caller must close, when there is none.
+    """
+    conn = getattr(_WORKER, 'conn', None)
+    if conn is not None and not conn.closed:
+        return conn, conn.cursor(), False
+    conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+    return conn, _tune_load_session(conn), True
+
+def _reset_after_error(conn, cur, owned):
+    """Put a connection back into a usable state after a failed COPY."""
+    if cur is not None:
+        try:
+            cur.close()
+        except Exception:
+            pass
+    if conn is None:
+        return
+    try:
+        conn.rollback()
+        if owned:
+            conn.close()
+    except Exception:
+        # Connection is broken: drop it so the next attempt reconnects
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if not owned and conn is getattr(_WORKER, 'conn', None):
+            _WORKER.conn = None
+
+def load_csv_file_direct(csv_file: str, db_host: str, db_port: int, db_name: str, db_user: str,
+                         db_password: str) -> bool:
+    """Load a CSV or pgcopy file over a direct psycopg2 connection.
+
+    Both formats COPY straight into md5_phone_map_bin: binary files as-is,
+    CSV files rewritten on the fly into COPY text rows with bytea literals.
+    """
     file_name = Path(csv_file).name
     max_retries = 3
     retry_delay = 0.1  # Start with 100ms
-    
+
     for attempt in range(max_retries):
+        conn = cur = None
+        owned = False
         try:
             file_start = time.time()
-            conn = psycopg2.connect(
-                host=db_host,
-                port=db_port,
-                database=db_name,
-                user=db_user,
-                password=db_password
-            )
-            # Set a lock timeout to avoid hanging
-            conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_READ_COMMITTED)
-            cur = conn.cursor()
-            cur.execute("SET lock_timeout = '5s'")
-            
-            # Clear staging table first (use DELETE instead of TRUNCATE to avoid deadlocks)
-            # DELETE is safer for concurrent operations
-            cur.execute("DELETE FROM staging_md5")
-            
-            # Read CSV and insert in batches
-            batch_size = 10000
-            batch = []
-            total_rows = 0
-            batch_count = 0
-            
+            conn, cur, owned = _worker_cursor(db_name, db_user, db_host, db_port, db_password)
+
+            # A failed file rolls back whole, and state tracking keeps
+            # loaded files from running twice
             if attempt == 0:  # Only print on first attempt
-                print(f"  [LOADING] {file_name}: Reading CSV file...")
-            
-            with open(csv_file, 'r') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    md5_hex, phone = row
-                    batch.append((md5_hex, phone))
-                    total_rows += 1
-                    
-                    if len(batch) >= batch_size:
-                        # Insert batch (staging table has no constraints, so no ON CONFLICT needed)
-                        execute_values(
-                            cur,
-                            "INSERT INTO staging_md5 (md5_hex, phone_number) VALUES %s",
-                            batch
-                        )
-                        batch_count += 1
-                        batch = []
-                        if batch_count % 10 == 0 and attempt == 0:
-                            print(f"  [LOADING] {file_name}: Loaded {batch_count * batch_size:,} rows into staging...")
-                
-                # Insert remaining
-                if batch:
-                    execute_values(
-                        cur,
-                        "INSERT INTO staging_md5 (md5_hex, phone_number) VALUES %s",
-                        batch
-                    )
-                    batch_count += 1
-            
-            if attempt == 0:
-                print(f"  [LOADING] {file_name}: Loaded {total_rows:,} rows into staging. Moving to main table...")
-            
-            # Insert into main table
-            cur.execute("""
-                INSERT INTO md5_phone_map_bin (md5_hash, phone_number)
-                SELECT decode(md5_hex, 'hex'), phone_number
-                FROM staging_md5
-                ON CONFLICT (md5_hash) DO NOTHING
-            """)
-            inserted_count = cur.rowcount if hasattr(cur, 'rowcount') else 0
-            
-            # Clear staging - use DELETE instead of TRUNCATE to avoid deadlocks
-            cur.execute("DELETE FROM staging_md5")
-            
+                print(f"  [LOADING] {file_name}: Streaming into md5_phone_map_bin via COPY...")
+
+            total_rows = _copy_data_files(cur, [csv_file])
+
             conn.commit()
             cur.close()
-            conn.close()
-            
+            if owned:
+                conn.close()
+
             file_time = time.time() - file_start
             if attempt > 0:
                 print(f"  [DONE] {file_name}: {total_rows:,} rows processed in {file_time:.1f}s (retry {attempt})")
             else:
                 print(f"  [DONE] {file_name}: {total_rows:,} rows processed in {file_time:.1f}s")
-            
+
             return True
-            
+
+
         except extensions.QueryCanceledError:
             # Lock timeout occurred
+            _reset_after_error(conn, cur, owned)
             if attempt < max_retries - 1:
                 wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
                 print(f"  [RETRY] {file_name}: Lock timeout, retrying in {wait_time:.1f}s... (attempt {attempt + 1}/{max_retries})")
@@ -281,6 +554,7 @@ def load_csv_file_direct(csv_file: str, db_host: str, db_port: int, db_name: str
                 return False
                 
         except (extensions.TransactionRollbackError, psycopg2.OperationalError) as e:
+            _reset_after_error(conn, cur, owned)
             error_str = str(e).lower()
             if 'deadlock' in error_str or 'lock' in error_str:
                 # Deadlock detected
@@ -294,6 +568,7 @@ def load_csv_file_direct(csv_file: str, db_host: str, db_port: int, db_name: str
                     return False
                 
         except Exception as e:
+            _reset_after_error(conn, cur, owned)
             print(f"  [ERROR] {file_name}: {e}")
             if attempt < max_retries - 1:
                 wait_time = retry_delay * (2 ** attempt)
@@ -304,111 +579,171 @@ def load_csv_file_direct(csv_file: str, db_host: str, db_port: int, db_name: str
     
     return False
 
-def load_csv_file(csv_file: str, container: str, db_name: str, db_user: str, 
-                  db_host: str = None, db_port: int = None, db_password: str = None) -> bool:
-    """Load a single CSV file into the database."""
-    # If running in Docker (has psycopg2 and DB connection info), use direct connection
-    if HAS_PSYCOPG2 and db_host and db_password:
-        return load_csv_file_direct(csv_file, db_host, db_port or 5432, db_name, db_user, db_password)
-    
-    # Otherwise use docker exec (when running from host)
-    try:
-        # Copy file to container
-        container_path = f"/tmp/{Path(csv_file).name}"
-        abs_csv_file = str(Path(csv_file).absolute())
-        subprocess.run([
-            "docker", "cp", abs_csv_file, f"{container}:{container_path}"
-        ], check=True, capture_output=True)
-        
-        # Load into staging
-        subprocess.run([
-            "docker", "exec", container,
-            "psql", "-U", db_user, "-d", db_name, "-q",
-            "-c", f"\\COPY staging_md5(md5_hex, phone_number) FROM '{container_path}' WITH CSV"
-        ], check=True, capture_output=True)
-        
-        # Insert into main table
-        subprocess.run([
-            "docker", "exec", container,
-            "psql", "-U", db_user, "-d", db_name, "-q",
-            "-c", """
-            INSERT INTO md5_phone_map_bin (md5_hash, phone_number)
-            SELECT decode(md5_hex, 'hex'), phone_number
-            FROM staging_md5
-            ON CONFLICT (md5_hash) DO NOTHING;
-            """
-        ], check=True, capture_output=True)
-        
-        # Clear staging
-        subprocess.run([
-            "docker", "exec", container,
-            "psql", "-U", db_user, "-d", db_name, "-q",
-            "-c", "TRUNCATE staging_md5;"
-        ], check=True, capture_output=True)
-        
-        # Remove file from container
-        subprocess.run([
-            "docker", "exec", container,
-            "rm", container_path
-        ], check=False, capture_output=True)
-        
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error loading {Path(csv_file).name}: {e}")
-        return False
+# Generated file names look like precomp_050_part003.csv[.zst]
+_PREFIX_PART_RE = re.compile(r'precomp_(\d+)_part\d+\.')
+
+def group_files_by_prefix(files: List[str]) -> Dict[str, List[str]]:
+    """Group data files by their phone prefix.
+
+    Files that don't follow the precomp_{prefix}_part* naming each get
+    their own single-file group.
+    """
+    groups: Dict[str, List[str]] = {}
+    for f in files:
+        m = _PREFIX_PART_RE.match(Path(f).name)
+        key = m.group(1) if m else Path(f).name
+        groups.setdefault(key, []).append(f)
+    return groups
+
+def load_prefix_group(files: List[str], db_name: str, db_user: str,
+                      db_host: str, db_port: int, db_password: str) -> bool:
+    """Load all parts of one prefix over a single connection and transaction.
+
+    The parts chain into one COPY statement, so the backend extends the
+    relation linearly (better heap locality than interleaved writers) and
+    the whole prefix commits once instead of once per file. A failure
+    rolls the entire prefix back, so state tracking stays all-or-nothing
+    per group.
+    """
+    group_name = Path(files[0]).name if len(files) == 1 else \
+        f"prefix {_PREFIX_PART_RE.match(Path(files[0]).name).group(1)} ({len(files)} files)"
+    max_retries = 3
+    retry_delay = 0.1  # Start with 100ms
+
+    for attempt in range(max_retries):
+        conn = cur = None
+        owned = False
+        try:
+            group_start = time.time()
+            conn, cur, owned = _worker_cursor(db_name, db_user, db_host, db_port, db_password)
+
+            # All parts feed one chained COPY: one statement, one rowcount,
+            # one start/end handshake for the whole prefix
+            total_rows = _copy_data_files(cur, sorted(files))
+
+            conn.commit()
+            cur.close()
+            if owned:
+                conn.close()
+
+            group_time = time.time() - group_start
+            print(f"  [DONE] {group_name}: {total_rows:,} rows committed in {group_time:.1f}s")
+            return True
+
+        except (extensions.QueryCanceledError, extensions.TransactionRollbackError,
+                psycopg2.OperationalError) as e:
+            _reset_after_error(conn, cur, owned)
+            if attempt < max_retries - 1:
+                wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
+                print(f"  [RETRY] {group_name}: {e} — retrying in {wait_time:.1f}s... "
+                      f"(attempt {attempt + 1}/{max_retries})")
+                time.sleep(wait_time)
+                continue
+            print(f"  [ERROR] {group_name}: {e} after {max_retries} attempts")
+            return False
+
+        except Exception as e:
+            _reset_after_error(conn, cur, owned)
+            print(f"  [ERROR] {group_name}: {e}")
+            return False
+
+    return False
+
+def load_prefix_group_worker(args_tuple):
+    """Worker function for parallel group loading."""
+    files, db_name, db_user, db_host, db_port, db_password = args_tuple
+    return load_prefix_group(files, db_name, db_user, db_host, db_port, db_password)
 
 def get_state_file(directory: str) -> Path:
-    """Get path to state file."""
-    return Path(directory) / ".load_state.json"
+    """Get path to the append-only state log."""
+    return Path(directory) / ".load_state.log"
 
 def load_state(directory: str) -> Dict:
-    """Load state from file."""
+    """Rebuild loading state from the append-only log.
+
+    The log holds one 'OK <file>' or 'FAIL <file>' line per completed
+    load attempt; later lines win, so a retried file that eventually
+    loads ends up in loaded_files only.
+    """
+    loaded: Set[str] = set()
+    failed: Set[str] = set()
     state_file = get_state_file(directory)
     if state_file.exists():
         try:
             with open(state_file, 'r') as f:
-                return json.load(f)
+                for line in f:
+                    status, _, file_name = line.rstrip('\n').partition(' ')
+                    if not file_name:
+                        continue
+                    if status == "OK":
+                        loaded.add(file_name)
+                        failed.discard(file_name)
+                    elif status == "FAIL":
+                        failed.add(file_name)
+                        loaded.discard(file_name)
         except Exception as e:
-            print(f"⚠️  Warning: Could not read state file: {e}")
-    return {
-        "loaded_files": [],
-        "failed_files": [],
-        "start_time": None,
-        "last_update": None
-    }
-
-def save_state(directory: str, state: Dict):
-    """Save state to file."""
-    state_file = get_state_file(directory)
-    state["last_update"] = time.time()
+            print(f"⚠️  Warning: Could not read state log: {e}")
+    else:
+        # Migrate from the legacy JSON state file if one is present
+        legacy = Path(directory) / ".load_state.json"
+        if legacy.exists():
+            try:
+                with open(legacy, 'r') as f:
+                    old = json.load(f)
+                loaded = set(old.get("loaded_files", []))
+                failed = set(old.get("failed_files", []))
+            except Exception as e:
+                print(f"⚠️  Warning: Could not read legacy state file: {e}")
+    return {"loaded_files": loaded, "failed_files": failed}
+
+def record_file_state(directory: str, file_name: str, success: bool):
+    """Append one load result to the state log.
+
+    O(1) per save regardless of how many files have been loaded, unlike
+    rewriting a JSON snapshot of the full history every few files.
+    """
     try:
-        with open(state_file, 'w') as f:
-            json.dump(state, f, indent=2)
+        with open(get_state_file(directory), 'a') as f:
+            f.write(f"{'OK' if success else 'FAIL'} {file_name}\n")
     except Exception as e:
-        print(f"⚠️  Warning: Could not save state file: {e}")
+        print(f"⚠️  Warning: Could not append to state log: {e}")
+
+def reset_state(directory: str) -> bool:
+    """Remove the state log (and any legacy JSON state file)."""
+    removed = False
+    for state_file in (get_state_file(directory), Path(directory) / ".load_state.json"):
+        if state_file.exists():
+            state_file.unlink()
+            removed = True
+    return removed
 
 def load_csv_file_worker(args_tuple):
-    """Worker function for parallel loading (must be at module level for multiprocessing)."""
-    csv_file, container, db_name, db_user, db_host, db_port, db_password = args_tuple
-    return load_csv_file(csv_file, container, db_name, db_user, db_host, db_port, db_password)
+    """Worker function for parallel loading."""
+    csv_file, db_name, db_user, db_host, db_port, db_password = args_tuple
+    return load_csv_file_direct(csv_file, db_host, db_port or 5432, db_name, db_user, db_password)
 
-def load_all_files(directory: str, container: str, db_name: str, db_user: str,
+def load_all_files(directory: str, db_name: str, db_user: str,
                    db_host: str = None, db_port: int = None, db_password: str = None,
-                   max_workers: int = 4):
+                   max_workers: int = None):
     """Load all CSV files from directory into database in parallel with state tracking."""
-    csv_files = sorted(glob.glob(str(Path(directory) / "*.csv")))
-    
+    csv_files = sorted(glob.glob(str(Path(directory) / "*.csv")) +
+                       glob.glob(str(Path(directory) / "*.pgcopy")) +
+                       glob.glob(str(Path(directory) / "*.packed")) +
+                       glob.glob(str(Path(directory) / "*.zst")))
+
     if not csv_files:
-        print(f"❌ No CSV files found in {directory}")
+        print(f"❌ No CSV/pgcopy files found in {directory}")
         return False
     
     # Load state
     state = load_state(directory)
-    loaded_files_set = set(state.get("loaded_files", []))
-    failed_files_set = set(state.get("failed_files", []))
-    
-    # Filter out already loaded files
-    files_to_load = [f for f in csv_files if str(Path(f).name) not in loaded_files_set]
+    loaded_files_set = state["loaded_files"]
+    failed_files_set = state["failed_files"]
+
+    # Compute each basename once and filter with a set difference instead
+    # of a per-file membership check
+    name_to_path = {os.path.basename(f): f for f in csv_files}
+    files_to_load = [name_to_path[n] for n in sorted(name_to_path.keys() - loaded_files_set)]
     
     if not files_to_load:
         print("=" * 70)
@@ -417,112 +752,90 @@ def load_all_files(directory: str, container: str, db_name: str, db_user: str,
         print(f"✓ All {len(csv_files)} files have already been loaded")
         print("Use --reset-state to reload all files")
         return True
-    
+
+    # One task (one connection, one transaction) per prefix group, so each
+    # worker appends a whole prefix contiguously and commits independently
+    groups = group_files_by_prefix(files_to_load)
+
+    # Size the pool to the machine by default; one PG connection per worker
+    if max_workers is None:
+        max_workers = min(len(groups), os.cpu_count() or 4)
+
     print("=" * 70)
     print("DATABASE LOADING")
     print("=" * 70)
     print(f"Total CSV files: {len(csv_files)}")
     print(f"Already loaded: {len(loaded_files_set)}")
-    print(f"Files to load: {len(files_to_load)}")
+    print(f"Files to load: {len(files_to_load)} in {len(groups)} prefix groups")
     print(f"Parallel workers: {max_workers}")
-    if db_host:
-        print(f"Connecting to: {db_host}:{db_port or 5432}/{db_name}")
-    else:
-        print(f"Container: {container}")
-        print(f"Database: {db_name}")
+    print(f"Connecting to: {db_host}:{db_port or 5432}/{db_name}")
     print()
     print("Starting to load CSV files into database...")
     print("Each file contains ~1,000,000 MD5 hash → phone number mappings")
     print("=" * 70)
     print()
     
-    # Initialize state if starting fresh
-    if state.get("start_time") is None:
-        state["start_time"] = time.time()
-        save_state(directory, state)
-    
     start_time = time.time()
     loaded_count = len(loaded_files_set)
     failed_count = len(failed_files_set)
     newly_loaded = 0
     newly_failed = 0
     
-    # Prepare worker arguments
+    # Prepare worker arguments: one task per prefix group
     worker_args = [
-        (csv_file, container, db_name, db_user, db_host, db_port, db_password)
-        for csv_file in files_to_load
+        (group_files, db_name, db_user, db_host, db_port, db_password)
+        for group_files in groups.values()
     ]
-    
-    # Use ProcessPoolExecutor for parallel loading
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+
+    # Threads, not processes: workers block in libpq (GIL released) and
+    # each thread keeps one connection open across the groups it handles
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            initializer=_init_load_worker,
+                            initargs=(db_name, db_user, db_host, db_port, db_password)) as executor:
         # Submit all tasks
-        future_to_file = {
-            executor.submit(load_csv_file_worker, args): Path(args[0]).name
+        future_to_files = {
+            executor.submit(load_prefix_group_worker, args): [os.path.basename(f) for f in args[0]]
             for args in worker_args
         }
-        
+
         # Process completed tasks
         completed = 0
-        for future in as_completed(future_to_file):
-            file_name = future_to_file[future]
+        for future in as_completed(future_to_files):
+            file_names = future_to_files[future]
             completed += 1
-            
+
             try:
                 success = future.result()
-                file_time = time.time() - start_time
-                
-                if success:
-                    newly_loaded += 1
-                    loaded_count += 1
-                    state["loaded_files"].append(file_name)
-                    # Remove from failed if it was there
-                    if file_name in state["failed_files"]:
-                        state["failed_files"].remove(file_name)
-                    
-                    # Show progress after each file
-                    elapsed = time.time() - start_time
-                    rate = completed / elapsed if elapsed > 0 else 0
-                    remaining = (len(files_to_load) - completed) / rate if rate > 0 else 0
-                    progress_pct = (completed / len(files_to_load) * 100) if len(files_to_load) > 0 else 0
-                    
-                    print(f"[{completed}/{len(files_to_load)}] ({progress_pct:.1f}%) ✓ {file_name} | "
-                          f"Loaded: {newly_loaded} | Failed: {newly_failed} | "
-                          f"Elapsed: {elapsed/60:.1f}m | Remaining: {remaining/60:.1f}m")
-                else:
-                    newly_failed += 1
-                    failed_count += 1
-                    if file_name not in state["failed_files"]:
-                        state["failed_files"].append(file_name)
-                    
-                    elapsed = time.time() - start_time
-                    progress_pct = (completed / len(files_to_load) * 100) if len(files_to_load) > 0 else 0
-                    print(f"[{completed}/{len(files_to_load)}] ({progress_pct:.1f}%) ❌ {file_name} | "
-                          f"Failed: {newly_failed}")
-                
-                # Save state periodically (every 5 files)
-                if completed % 5 == 0:
-                    save_state(directory, state)
-                    
-                    # Show summary progress
-                    elapsed = time.time() - start_time
-                    rate = completed / elapsed if elapsed > 0 else 0
-                    remaining = (len(files_to_load) - completed) / rate if rate > 0 else 0
-                    print(f"  ════════════════════════════════════════════════════════════════════════")
-                    print(f"  📊 SUMMARY: {completed}/{len(files_to_load)} files processed | "
-                          f"✅ Loaded: {newly_loaded} | ❌ Failed: {newly_failed} | "
-                          f"⏱️  Elapsed: {elapsed/60:.1f}m | ⏳ Remaining: {remaining/60:.1f}m")
-                    print(f"  ════════════════════════════════════════════════════════════════════════")
-                    
             except Exception as e:
-                newly_failed += 1
-                failed_count += 1
-                if file_name not in state["failed_files"]:
-                    state["failed_files"].append(file_name)
-                print(f"[{completed}/{len(files_to_load)}] ❌ {file_name} (Exception: {e})")
-    
-    # Final state save
-    save_state(directory, state)
-    
+                success = False
+                print(f"[{completed}/{len(groups)}] ❌ {', '.join(file_names)} (Exception: {e})")
+
+            for file_name in file_names:
+                record_file_state(directory, file_name, success)
+
+            if success:
+                newly_loaded += len(file_names)
+                loaded_count += len(file_names)
+
+                # Show progress after each group
+                elapsed = time.time() - start_time
+                rate = completed / elapsed if elapsed > 0 else 0
+                remaining = (len(groups) - completed) / rate if rate > 0 else 0
+                progress_pct = (completed / len(groups) * 100) if len(groups) > 0 else 0
+
+                print(f"[{completed}/{len(groups)}] ({progress_pct:.1f}%) ✓ {len(file_names)} files | "
+                      f"Loaded: {newly_loaded} | Failed: {newly_failed} | "
+                      f"Elapsed: {elapsed/60:.1f}m | Remaining: {remaining/60:.1f}m")
+            else:
+                # The whole group rolled back together
+                newly_failed += len(file_names)
+                failed_count += len(file_names)
+
+                elapsed = time.time() - start_time
+                progress_pct = (completed / len(groups) * 100) if len(groups) > 0 else 0
+                print(f"[{completed}/{len(groups)}] ({progress_pct:.1f}%) ❌ {len(file_names)} files | "
+                      f"Failed: {newly_failed}")
+
     total_time = time.time() - start_time
     
     print()
@@ -537,108 +850,39 @@ def load_all_files(directory: str, container: str, db_name: str, db_user: str,
     if len(files_to_load) == newly_loaded:
         print("Running ANALYZE on md5_phone_map_bin...")
         try:
-            # Always use direct connection when running in Docker (has db_host and db_password)
-            # Check if we have connection info from environment (Docker mode)
-            if db_host and db_password:
-                if HAS_PSYCOPG2:
-                    conn = psycopg2.connect(
-                        host=db_host,
-                        port=db_port or 5432,
-                        database=db_name,
-                        user=db_user,
-                        password=db_password
-                    )
-                    cur = conn.cursor()
-                    cur.execute("ANALYZE md5_phone_map_bin;")
-                    conn.commit()
-                    cur.close()
-                    conn.close()
-                    print("✓ ANALYZE completed")
-                else:
-                    print("⚠ Warning: psycopg2 not available, skipping ANALYZE")
-            else:
-                # Only use docker exec when running from host (not in Docker)
-                # This should not happen when running in Docker Compose
-                try:
-                    subprocess.run([
-                        "docker", "exec", container,
-                        "psql", "-U", db_user, "-d", db_name,
-                        "-c", "ANALYZE md5_phone_map_bin;"
-                    ], check=True, capture_output=True)
-                    print("✓ ANALYZE completed")
-                except FileNotFoundError:
-                    print("⚠ Warning: docker command not available, skipping ANALYZE")
+            conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+            cur = conn.cursor()
+            cur.execute("ANALYZE md5_phone_map_bin;")
+            conn.commit()
+            cur.close()
+            conn.close()
+            print("✓ ANALYZE completed")
         except Exception as e:
             print(f"⚠ Warning: ANALYZE failed: {e}")
-        
+
         # Show final statistics
         print()
         print("Final statistics:")
         try:
-            # Always use direct connection when running in Docker
-            if HAS_PSYCOPG2 and db_host and db_password:
-                conn = psycopg2.connect(
-                    host=db_host,
-                    port=db_port or 5432,
-                    database=db_name,
-                    user=db_user,
-                    password=db_password
-                )
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT 
-                        COUNT(*) as total_rows,
-                        pg_size_pretty(pg_total_relation_size('md5_phone_map_bin')) as table_size
-                    FROM md5_phone_map_bin;
-                """)
-                result = cur.fetchone()
-                print(f"Total rows: {result[0]:,}")
-                print(f"Table size: {result[1]}")
-                cur.close()
-                conn.close()
-            else:
-                # Only use docker exec when running from host (not in Docker)
-                try:
-                    subprocess.run([
-                        "docker", "exec", container,
-                        "psql", "-U", db_user, "-d", db_name,
-                        "-c", """
-                        SELECT 
-                            COUNT(*) as total_rows,
-                            pg_size_pretty(pg_total_relation_size('md5_phone_map_bin')) as table_size
-                        FROM md5_phone_map_bin;
-                        """
-                    ], check=True)
-                except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                    # If docker exec fails and we're in Docker, try direct connection
-                    if HAS_PSYCOPG2 and db_host and db_password:
-                        try:
-                            conn = psycopg2.connect(
-                                host=db_host,
-                                port=db_port or 5432,
-                                database=db_name,
-                                user=db_user,
-                                password=db_password
-                            )
-                            cur = conn.cursor()
-                            cur.execute("""
-                                SELECT 
-                                    COUNT(*) as total_rows,
-                                    pg_size_pretty(pg_total_relation_size('md5_phone_map_bin')) as table_size
-                                FROM md5_phone_map_bin;
-                            """)
-                            result = cur.fetchone()
-                            print(f"Total rows: {result[0]:,}")
-                            print(f"Table size: {result[1]}")
-                            cur.close()
-                            conn.close()
-                        except Exception as e2:
-                            print(f"⚠ Warning: Could not get statistics: {e2}")
-                    else:
-                        print(f"⚠ Warning: Could not get statistics: {e}")
+            conn = connect_db(db_name, db_user, db_host, db_port, db_password)
+            cur = conn.cursor()
+            # reltuples is the planner's estimate, fresh from the ANALYZE
+            # above — a COUNT(*) here would seq-scan all 100M rows again
+            cur.execute("""
+                SELECT
+                    reltuples::bigint as total_rows,
+                    pg_size_pretty(pg_total_relation_size('md5_phone_map_bin')) as table_size
+                FROM pg_class
+                WHERE relname = 'md5_phone_map_bin';
+            """)
+            result = cur.fetchone()
+            print(f"Total rows (estimate): {result[0]:,}")
+            print(f"Table size: {result[1]}")
+            cur.close()
+            conn.close()
         except Exception as e:
             print(f"⚠ Warning: Could not get statistics: {e}")
-    
+
     return newly_failed == 0
 
 def main():
@@ -649,20 +893,34 @@ def main():
                        help='Output directory for CSV files (default: ./precomp_data)')
     parser.add_argument('--parallel', type=int, default=10,
                        help='Number of parallel files per prefix (default: 10)')
+    parser.add_argument('--format', choices=['csv', 'pgcopy', 'packed'], default='pgcopy',
+                       help='Generated file format: csv, PostgreSQL binary COPY, or '
+                            'packed 27-byte records (default: pgcopy — the load becomes '
+                            'a raw byte stream with no parsing on either side)')
+    parser.add_argument('--compress', action='store_true',
+                       help='Generate zstd-compressed .zst files (requires the zstandard package)')
     parser.add_argument('--skip-generation', action='store_true',
                        help='Skip generation, only load existing CSV files')
-    parser.add_argument('--container', type=str, default='md5-hash-postgres-1',
-                       help='PostgreSQL container name (default: md5-hash-postgres-1)')
     parser.add_argument('--db-name', type=str, default='md5db',
                        help='Database name (default: md5db)')
     parser.add_argument('--db-user', type=str, default='md5',
                        help='Database user (default: md5)')
     parser.add_argument('--clear-table', action='store_true',
                        help='Clear table before loading (default: only load if empty)')
-    parser.add_argument('--max-workers', type=int, default=4,
-                       help='Number of parallel workers for loading (default: 4)')
+    parser.add_argument('--max-workers', type=int, default=None,
+                       help='Number of parallel workers for loading (default: number of CPUs)')
     parser.add_argument('--reset-state', action='store_true',
                        help='Reset loading state and start from beginning')
+    parser.add_argument('--delete-after-load', action='store_true',
+                       help='Delete each generated file once it is loaded '
+                            '(caps disk usage at the files currently in flight)')
+    parser.add_argument('--drop-indexes', action='store_true',
+                       help='Drop indexes before loading and rebuild them once at the end '
+                            '(fastest for a fresh load)')
+    parser.add_argument('--unlogged', action='store_true',
+                       help='Make md5_phone_map_bin UNLOGGED during the load and restore '
+                            'LOGGED at the end (skips WAL for the bulk writes; the table '
+                            'is lost on a crash until it is logged again)')
     
     args = parser.parse_args()
     
@@ -671,41 +929,38 @@ def main():
     print("=" * 70)
     print()
     
-    # Get DB connection info from environment (when running in Docker)
-    db_host = os.getenv('POSTGRES_HOST', None)
-    db_port = int(os.getenv('POSTGRES_PORT', '5432')) if os.getenv('POSTGRES_PORT') else None
-    db_password = os.getenv('DB_PASSWORD', None)
-    
-    # Check Docker container (skip if running in Docker with direct DB connection)
-    if not (HAS_PSYCOPG2 and db_host):
-        if not check_docker_container(args.container):
-            print(f"❌ Error: Docker container '{args.container}' is not running")
-            print("Please start the container with: docker compose up -d postgres")
-            sys.exit(1)
-        print(f"✓ Docker container '{args.container}' is running")
-    else:
-        print(f"✓ Running in Docker, connecting directly to {db_host}:{db_port or 5432}")
+    # DB connection info comes from the environment; in Docker Compose the
+    # data-loader service sets all three, on a host the published port on
+    # localhost is the default and only DB_PASSWORD is required
+    db_host = os.getenv('POSTGRES_HOST', 'localhost')
+    db_port = int(os.getenv('POSTGRES_PORT', '5432'))
+    db_password = os.getenv('DB_PASSWORD')
+
+    if not HAS_PSYCOPG2:
+        print("❌ Error: psycopg2 is required (pip install psycopg2-binary)")
+        sys.exit(1)
+    if not db_password:
+        print("❌ Error: DB_PASSWORD environment variable is not set")
+        print("   e.g. DB_PASSWORD=md5pass python load_all_numbers.py ...")
+        sys.exit(1)
+    print(f"✓ Connecting directly to {db_host}:{db_port}")
     print()
     
     # Reset state if requested
     if args.reset_state:
-        state_file = get_state_file(args.out_dir)
-        if state_file.exists():
-            state_file.unlink()
+        if reset_state(args.out_dir):
             print("✓ Loading state reset")
         print()
     
     # Check if table is empty or needs clearing
-    is_empty = check_table_empty(args.container, args.db_name, args.db_user, db_host, db_port, db_password)
+    is_empty = check_table_empty(args.db_name, args.db_user, db_host, db_port, db_password)
     if not is_empty:
         if args.clear_table:
-            if not clear_table(args.container, args.db_name, args.db_user, db_host, db_port, db_password):
+            if not clear_table(args.db_name, args.db_user, db_host, db_port, db_password):
                 print("❌ Failed to clear table")
                 sys.exit(1)
             # Also reset state when clearing table
-            state_file = get_state_file(args.out_dir)
-            if state_file.exists():
-                state_file.unlink()
+            if reset_state(args.out_dir):
                 print("✓ Loading state reset")
         else:
             print("⚠️  Warning: md5_phone_map_bin table is not empty!")
@@ -719,25 +974,59 @@ def main():
         print("✓ Table is empty, ready to load")
         print()
     
-    # Step 1: Generate CSV files (if not skipped)
-    if not args.skip_generation:
-        if not generate_all_prefixes(args.out_dir, args.parallel):
-            print("❌ Generation failed")
+    # Drop indexes before loading so COPYs append to an unindexed heap
+    if args.drop_indexes:
+        if not drop_indexes(args.db_name, args.db_user, db_host, db_port, db_password):
             sys.exit(1)
-    else:
+        print()
+
+    # Skip WAL for the bulk writes; SET LOGGED below rewrites the table
+    # once into the WAL, which amortizes over all the COPYs
+    if args.unlogged:
+        if not _run_maintenance_sql("Making md5_phone_map_bin UNLOGGED for the load...",
+                                    "ALTER TABLE md5_phone_map_bin SET UNLOGGED;",
+                                    args.db_name, args.db_user, db_host, db_port, db_password):
+            sys.exit(1)
+        print()
+
+    if args.skip_generation:
+        # Load pre-existing files only
         print("Skipping generation (using existing files)")
         print()
-    
-    # Step 2: Load into database
-    if not load_all_files(args.out_dir, args.container, args.db_name, args.db_user,
-                         db_host, db_port, db_password, args.max_workers):
+        success = load_all_files(args.out_dir, args.db_name, args.db_user,
+                                 db_host, db_port, db_password, args.max_workers)
+    else:
+        # Generate and load concurrently: files stream into PostgreSQL as
+        # soon as their generator worker finishes them
+        success = generate_and_load_pipelined(args.out_dir, args.parallel, args.format,
+                                              args.compress, args.db_name, args.db_user,
+                                              db_host, db_port, db_password,
+                                              args.max_workers, args.delete_after_load)
+
+    if not success:
         print("❌ Some files failed to load")
         print("   You can rerun the script to retry failed files")
         state = load_state(args.out_dir)
         if state.get("failed_files"):
             print(f"   Failed files: {len(state['failed_files'])}")
         sys.exit(1)
-    
+
+    # Restore durability: one sequential WAL rewrite of the finished table
+    if args.unlogged:
+        print()
+        if not _run_maintenance_sql("Restoring md5_phone_map_bin to LOGGED (rewrites the table)...",
+                                    "ALTER TABLE md5_phone_map_bin SET LOGGED;",
+                                    args.db_name, args.db_user, db_host, db_port, db_password):
+            print("❌ SET LOGGED failed — rerun it manually before relying on the data surviving a crash")
+            sys.exit(1)
+
+    # Rebuild indexes in one sort-based pass now that all rows are in
+    if args.drop_indexes:
+        print()
+        if not recreate_indexes(args.db_name, args.db_user, db_host, db_port, db_password):
+            print("❌ Index rebuild failed — rerun recreate manually before using the table")
+            sys.exit(1)
+
     print()
     print("=" * 70)
     print("✓ ALL DONE!")
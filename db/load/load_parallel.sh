@@ -0,0 +1,61 @@
+#!/bin/bash
+# Parallel bulk load driven entirely by the shell: xargs -P fans the
+# files out over K concurrent psql COPY streams, no Python in the loop.
+# Handles the generator's formats: .pgcopy(.zst) goes straight into
+# md5_phone_map_bin as binary COPY, .csv(.zst) through a per-transaction
+# TEMP staging table. .zst files are decompressed inline with zstd -dc.
+# Usage: ./load_parallel.sh <directory> [workers] [db_name] [db_user]
+
+DIR=$1
+WORKERS=${2:-4}
+DB_NAME=${3:-md5db}
+DB_USER=${4:-md5}
+
+if [ -z "$DIR" ]; then
+    echo "Usage: ./load_parallel.sh <directory> [workers] [db_name] [db_user]"
+    exit 1
+fi
+
+export DB_NAME DB_USER
+
+load_one() {
+    # Set here, not at the top: the xargs children are fresh bash
+    # processes and don't inherit shell options. Without pipefail a
+    # decompressor dying mid-stream would leave psql's exit status as
+    # the pipeline's, reporting a partial load as "Done"
+    set -o pipefail
+    file=$1
+    echo "Loading $file..."
+    case "$file" in
+        *.zst) cat_cmd="zstd -dc" ;;
+        *)     cat_cmd="cat" ;;
+    esac
+    case "$file" in
+        *.pgcopy|*.pgcopy.zst)
+            sql="BEGIN;
+                 SET LOCAL synchronous_commit = off;
+                 COPY md5_phone_map_bin (md5_hash, phone_number) FROM STDIN WITH (FORMAT BINARY);
+                 COMMIT;" ;;
+        *)
+            sql="BEGIN;
+                 SET LOCAL synchronous_commit = off;
+                 CREATE TEMP TABLE staging_md5 (md5_hex CHAR(32), phone_number CHAR(11)) ON COMMIT DROP;
+                 COPY staging_md5(md5_hex, phone_number) FROM STDIN WITH (FORMAT csv);
+                 INSERT INTO md5_phone_map_bin (md5_hash, phone_number)
+                 SELECT decode(md5_hex, 'hex'), phone_number FROM staging_md5;
+                 COMMIT;" ;;
+    esac
+    $cat_cmd "$file" | psql -d "$DB_NAME" -U "$DB_USER" -v ON_ERROR_STOP=1 -q -c "$sql" \
+        && echo "Done loading $file"
+}
+export -f load_one
+
+# .packed(.zst) is deliberately excluded: psql cannot reframe the raw
+# 27-byte records, so those files belong to load_all_numbers.py
+find "$DIR" \( -name '*.csv' -o -name '*.csv.zst' -o -name '*.pgcopy' -o -name '*.pgcopy.zst' \) -type f -print0 |
+    xargs -0 -P "$WORKERS" -I{} bash -c 'load_one "$@"' _ {} || exit 1
+
+echo "All files loaded. Running ANALYZE..."
+psql -d "$DB_NAME" -U "$DB_USER" -c "ANALYZE md5_phone_map_bin;"
+
+echo "Done!"
@@ -1,15 +1,57 @@
 #!/usr/bin/env python3
 """
-Load a single CSV file into PostgreSQL.
+Load a single CSV or pgcopy file into PostgreSQL.
 
 Usage:
     python load_single_file.py <csv_file> [container_name] [db_name] [db_user]
 """
 
+import os
 import sys
 import subprocess
 from pathlib import Path
 
+# A native connection to the published host port avoids the docker exec
+# namespace entry and its stdio pipe; docker exec psql is the fallback
+try:
+    import psycopg2
+    HAS_PSYCOPG2 = True
+except ImportError:
+    HAS_PSYCOPG2 = False
+
+# Client-side binary COPY framing (PgcopyChain) shared with the direct loader
+import load_all_numbers
+
+READ_BUFFER_SIZE = 1 << 20
+
+def _load_native(csv_file: str, db_name: str, db_user: str):
+    """Load the file over a direct libpq connection, no Docker involved.
+
+    PgcopyChain reframes any supported format into one binary COPY on
+    md5_phone_map_bin, so no staging table is needed. Connection details
+    come from POSTGRES_HOST / POSTGRES_PORT / DB_PASSWORD (compose
+    defaults otherwise).
+    """
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5432')),
+        database=db_name,
+        user=db_user,
+        password=os.getenv('DB_PASSWORD', 'md5pass')
+    )
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL synchronous_commit = off;")
+        cur.copy_expert(
+            "COPY md5_phone_map_bin (md5_hash, phone_number) FROM STDIN WITH (FORMAT BINARY)",
+            load_all_numbers.PgcopyChain([csv_file]), size=READ_BUFFER_SIZE)
+        conn.commit()
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = 'md5_phone_map_bin';")
+        print(f"\nCurrent count in md5_phone_map_bin (estimate): {cur.fetchone()[0]:,}")
+        cur.close()
+    finally:
+        conn.close()
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python load_single_file.py <csv_file> [container_name] [db_name] [db_user]")
@@ -24,56 +66,62 @@ def main():
         print(f"Error: File {csv_file} not found")
         sys.exit(1)
     
+    if HAS_PSYCOPG2:
+        print(f"Loading {csv_file} into {db_name} over the published port...")
+        print("Loading binary COPY data into md5_phone_map_bin...")
+        _load_native(csv_file, db_name, db_user)
+        print("\n✓ Done!")
+        return
+
     print(f"Loading {csv_file} into {container}/{db_name}...")
-    
-    # Copy file to container
-    container_path = f"/tmp/{Path(csv_file).name}"
-    print(f"Copying file to container...")
-    subprocess.run([
-        "docker", "cp", csv_file, f"{container}:{container_path}"
-    ], check=True)
-    
-    # Load into staging
-    print("Loading into staging table...")
-    subprocess.run([
-        "docker", "exec", container,
-        "psql", "-U", db_user, "-d", db_name,
-        "-c", f"\\COPY staging_md5(md5_hex, phone_number) FROM '{container_path}' WITH CSV"
-    ], check=True)
-    
-    # Insert into main table
-    print("Inserting into md5_phone_map_bin...")
-    subprocess.run([
-        "docker", "exec", container,
-        "psql", "-U", db_user, "-d", db_name,
-        "-c", """
-        INSERT INTO md5_phone_map_bin (md5_hash, phone_number)
-        SELECT decode(md5_hex, 'hex'), phone_number
-        FROM staging_md5
-        ON CONFLICT (md5_hash) DO NOTHING;
-        """
-    ], check=True)
-    
-    # Clear staging
-    print("Clearing staging table...")
-    subprocess.run([
-        "docker", "exec", container,
-        "psql", "-U", db_user, "-d", db_name,
-        "-c", "TRUNCATE staging_md5;"
-    ], check=True)
-    
-    # Remove file from container
-    subprocess.run([
-        "docker", "exec", container,
-        "rm", container_path
-    ], check=False)
-    
-    # Show count
-    print("\nCurrent count in md5_phone_map_bin:")
+
+    if csv_file.endswith('.pgcopy'):
+        # pgcopy files carry raw digests in binary COPY framing, so they
+        # stream straight into the main table: no staging pass, no
+        # server-side decode(), no merge statement
+        print("Loading binary COPY data into md5_phone_map_bin...")
+        with open(csv_file, 'rb') as f:
+            subprocess.run([
+                "docker", "exec", "-i", container,
+                "psql", "-U", db_user, "-d", db_name,
+                "-c", "BEGIN; SET LOCAL synchronous_commit = off; "
+                      "COPY md5_phone_map_bin (md5_hash, phone_number) FROM STDIN WITH (FORMAT BINARY); "
+                      "COMMIT;"
+            ], stdin=f, check=True)
+    else:
+        # One psql invocation and one transaction: staging is a TEMP
+        # table dropped at COMMIT (no drain, no TRUNCATE, no WAL), COPY
+        # reads the piped file until EOF, then the merge runs and
+        # everything commits once with synchronous_commit off
+        print("Loading and merging into md5_phone_map_bin...")
+        with open(csv_file, 'rb') as f:
+            subprocess.run([
+                "docker", "exec", "-i", container,
+                "psql", "-U", db_user, "-d", db_name,
+                "-c", """
+                BEGIN;
+                SET LOCAL synchronous_commit = off;
+                CREATE TEMP TABLE staging_md5 (
+                    md5_hex CHAR(32),
+                    phone_number CHAR(11)
+                ) ON COMMIT DROP;
+                COPY staging_md5(md5_hex, phone_number) FROM STDIN WITH (FORMAT csv);
+                -- no ON CONFLICT: each phone appears in exactly one
+                -- generated file, so the per-row unique probe is waste
+                INSERT INTO md5_phone_map_bin (md5_hash, phone_number)
+                SELECT decode(md5_hex, 'hex'), phone_number
+                FROM staging_md5;
+                COMMIT;
+                """
+            ], stdin=f, check=True)
+
+    # Planner estimate instead of COUNT(*): close enough for a progress
+    # readout and skips a full scan of a table this large
+    print("\nCurrent count in md5_phone_map_bin (estimate):")
     subprocess.run([
         "docker", "exec", container,
         "psql", "-U", db_user, "-d", db_name,
-        "-c", "SELECT COUNT(*) FROM md5_phone_map_bin;"
+        "-c", "SELECT reltuples::bigint FROM pg_class WHERE relname = 'md5_phone_map_bin';"
     ], check=True)
     
     print("\n✓ Done!")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Numba-parallel MD5 kernel for batches of short (single-block) messages.
+
+All phone-number messages here are 11 bytes, far below the 55-byte
+single-block limit, so each digest is one MD5 transform over a padded
+64-byte block. md5_many runs that transform across all rows of a batch
+with prange, parallelizing across cores inside a generator worker.
+
+Used by generate_precomp.py when numba is installed; without numba the
+kernel still runs as plain (slow) Python, which keeps it testable.
+"""
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        return wrap
+
+    def prange(*args):
+        return range(*args)
+
+_MASK = 0xFFFFFFFF
+
+# Per-round left-rotate amounts
+_S = (
+    7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22,
+    5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20,
+    4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23,
+    6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21,
+)
+
+# K[i] = floor(2^32 * abs(sin(i + 1)))
+_K = (
+    0xd76aa478, 0xe8c7b756, 0x242070db, 0xc1bdceee,
+    0xf57c0faf, 0x4787c62a, 0xa8304613, 0xfd469501,
+    0x698098d8, 0x8b44f7af, 0xffff5bb1, 0x895cd7be,
+    0x6b901122, 0xfd987193, 0xa679438e, 0x49b40821,
+    0xf61e2562, 0xc040b340, 0x265e5a51, 0xe9b6c7aa,
+    0xd62f105d, 0x02441453, 0xd8a1e681, 0xe7d3fbc8,
+    0x21e1cde6, 0xc33707d6, 0xf4d50d87, 0x455a14ed,
+    0xa9e3e905, 0xfcefa3f8, 0x676f02d9, 0x8d2a4c8a,
+    0xfffa3942, 0x8771f681, 0x6d9d6122, 0xfde5380c,
+    0xa4beea44, 0x4bdecfa9, 0xf6bb4b60, 0xbebfbc70,
+    0x289b7ec6, 0xeaa127fa, 0xd4ef3085, 0x04881d05,
+    0xd9d4d039, 0xe6db99e5, 0x1fa27cf8, 0xc4ac5665,
+    0xf4292244, 0x432aff97, 0xab9423a7, 0xfc93a039,
+    0x655b59c3, 0x8f0ccc92, 0xffeff47d, 0x85845dd1,
+    0x6fa87e4f, 0xfe2ce6e0, 0xa3014314, 0x4e0811a1,
+    0xf7537e82, 0xbd3af235, 0x2ad7d2bb, 0xeb86d391,
+)
+
+
+@njit(parallel=True, cache=True)
+def md5_many(msgs, msg_len, head_len, out):
+    """Compute MD5 digests for all rows of msgs into out.
+
+    msgs: (n, msg_len) uint8 rows (msg_len <= 55, single block)
+    head_len: length of the prefix shared by every row (may be 0)
+    out:  (n, 16) uint8 digest rows, written in place
+
+    The 16-word message schedule is mostly constant across a batch: the
+    shared head, the 0x80 pad byte, the zero filler and the bit length
+    never change, only the digit tail does. The constant words are
+    packed once into a template and each row rebuilds just the words
+    that overlap its variable bytes [head_len, msg_len).
+    """
+    n = len(msgs)
+
+    # Template schedule built from row 0; variable words get overwritten
+    # per row, so only the constant words need to be right here
+    # int() keeps the pure-Python fallback on Python ints: a uint8 scalar
+    # would overflow under NumPy 2 promotion once shifted into a word
+    block = [0] * 64
+    for j in range(msg_len):
+        block[j] = int(msgs[0][j])
+    block[msg_len] = 0x80
+    bitlen = msg_len * 8
+    block[56] = bitlen & 0xFF
+    block[57] = (bitlen >> 8) & 0xFF
+    m_template = [0] * 16
+    for w in range(16):
+        m_template[w] = (block[4 * w]
+                         | (block[4 * w + 1] << 8)
+                         | (block[4 * w + 2] << 16)
+                         | (block[4 * w + 3] << 24))
+
+    # Words touched by the variable tail (the word holding the 0x80 byte
+    # is rebuilt too when it shares a word with the last digits)
+    w_first = head_len // 4
+    w_last = (msg_len - 1) // 4 if msg_len > head_len else w_first - 1
+
+    for r in prange(n):
+        m = [0] * 16
+        for w in range(16):
+            m[w] = m_template[w]
+        for w in range(w_first, w_last + 1):
+            word = 0
+            for k in range(4):
+                j = 4 * w + k
+                if j < msg_len:
+                    byte = int(msgs[r][j])
+                elif j == msg_len:
+                    byte = 0x80
+                else:
+                    byte = 0
+                word |= byte << (8 * k)
+            m[w] = word
+
+        a = 0x67452301
+        b = 0xefcdab89
+        c = 0x98badcfe
+        d = 0x10325476
+
+        for i in range(64):
+            if i < 16:
+                f = (b & c) | (~b & d)
+                g = i
+            elif i < 32:
+                f = (d & b) | (~d & c)
+                g = (5 * i + 1) % 16
+            elif i < 48:
+                f = b ^ c ^ d
+                g = (3 * i + 5) % 16
+            else:
+                f = c ^ (b | (~d & _MASK))
+                g = (7 * i) % 16
+            f = (f + a + _K[i] + m[g]) & _MASK
+            a = d
+            d = c
+            c = b
+            b = (b + (((f << _S[i]) | (f >> (32 - _S[i]))) & _MASK)) & _MASK
+
+        a = (a + 0x67452301) & _MASK
+        b = (b + 0xefcdab89) & _MASK
+        c = (c + 0x98badcfe) & _MASK
+        d = (d + 0x10325476) & _MASK
+
+        regs = (a, b, c, d)
+        for w in range(4):
+            reg = regs[w]
+            out[r][4 * w] = reg & 0xFF
+            out[r][4 * w + 1] = (reg >> 8) & 0xFF
+            out[r][4 * w + 2] = (reg >> 16) & 0xFF
+            out[r][4 * w + 3] = (reg >> 24) & 0xFF